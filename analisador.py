@@ -1,5 +1,6 @@
 # analisador.py — travas: 1x por candle + near-edge-only | horário BRT (UTC-3)
-import os, time, requests
+import os, time, threading, requests
+from bisect import bisect_left
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone, timedelta
@@ -11,12 +12,16 @@ from indicadores_tecnicos import (
     detectar_martelo, detectar_martelo_invertido,
     detectar_engolfo, detectar_estrela_manha, detectar_estrela_noite,
     detectar_tres_soldados_brancos, detectar_tres_corvos_negros,
-    detectar_divergencia_rsi, detectar_divergencia_obv,
     detectar_squeeze_overextension,
     # extras
     calcular_atr, calcular_percent_b, calcular_bollinger_width,
     calcular_spread_vs_ma, calcular_volatilidade_pct
 )
+from backfill import carregar_klines
+from orcamento_api import ORCAMENTO, URGENTE, NORMAL, BAIXA, PESO_KLINES, binance_get
+from pivos import DivergenciaIncremental
+from requisicao_hedged import buscar_hedged
+from suporte_resistencia import MapaSuporteResistencia
 from utils import consultar_eventos_cripto, consultar_indice_fear_greed
 
 # Garante .env carregado neste fluxo também
@@ -30,6 +35,8 @@ def _now_brt(fmt="%d/%m/%Y %H:%M:%S"):
 _LAST_ALERT_TS = {}      # { "ATIVO:tipo": epoch }
 _LAST_BAR_CLOSE_TS = {}  # { "ATIVO:INTERVALO": last_close_ms }
 _NEAR_STATE = {}         # { "ATIVO:INTERVALO:buy|sell": bool }
+_DIVERG_STATE = {}       # { "ATIVO:INTERVALO": {ultimo_open, obv_ref, rsi, obv, macd} }
+_SR_STATE = {}           # { "ATIVO:INTERVALO": {ultimo_open, mapa} }
 
 def _cooldown_ok(ativo, tipo, minutes):
     if minutes <= 0:
@@ -69,11 +76,24 @@ def _get_cfg():
     near_edge_only  = os.getenv("NEAR_EDGE_ONLY", "1") == "1"
     return near_pct, cooldown_min, send_only, only_on_new_bar, near_edge_only
 
-# ========= fetch Binance com fallback
+# ========= fetch Binance hedged entre hosts (via orçamento de peso compartilhado)
+def _prioridade_fetch(ativo, intervalo):
+    """URGENTE perto de alvo; BAIXA sem alvos (só snapshot); NORMAL no resto."""
+    alvo_buy, alvo_sell = _get_targets(ativo)
+    if alvo_buy is None and alvo_sell is None:
+        return BAIXA
+    if _NEAR_STATE.get(f"{ativo}:{intervalo}:buy") or _NEAR_STATE.get(f"{ativo}:{intervalo}:sell"):
+        return URGENTE
+    return NORMAL
+
+def _espera_max(prioridade):
+    return None if prioridade == URGENTE else float(os.getenv("FETCH_ESPERA_MAX_S", "60"))
+
 def _try_fetch_klines(ativo, par, intervalo, base_url):
+    # o peso já foi reservado por quem chama (_fetch_candles / _preparar)
     url = f"{base_url.rstrip('/')}/api/v3/klines?symbol={par.upper()}&interval={intervalo}&limit=100"
     try:
-        r = requests.get(url, timeout=10)
+        r = binance_get(url, PESO_KLINES, reservado=True, timeout=10)
         if r.status_code == 200:
             return r, None
         detalhe = r.text[:200].replace("\n", " ")
@@ -81,23 +101,60 @@ def _try_fetch_klines(ativo, par, intervalo, base_url):
     except Exception as e:
         return None, f"[{ativo}] Erro de rede ao acessar {base_url}: {e}"
 
-def _fetch_candles(ativo, par, intervalo):
+def _bases_binance():
+    # BINANCE_BASE_URLS (lista separada por vírgula) substitui tudo — ex.: só servidores locais
+    fixas = [b.strip().rstrip("/") for b in os.getenv("BINANCE_BASE_URLS", "").split(",") if b.strip()]
+    if fixas:
+        return fixas
     base_env = os.getenv("BINANCE_BASE_URL", "https://data-api.binance.vision").rstrip("/")
     bases = [base_env]
     alt = "https://data-api.binance.vision" if "api.binance.com" in base_env else "https://api.binance.com"
-    if alt not in bases:
-        bases.append(alt)
-    response = None
-    last_err = None
-    for idx, base in enumerate(bases, start=1):
-        response, last_err = _try_fetch_klines(ativo, par, intervalo, base)
-        if response is not None:
-            if idx > 1:
-                print(f"[{ativo}] Fallback OK via {base}")
-            break
+    extras = [b.strip().rstrip("/") for b in os.getenv("BINANCE_BASE_URLS_EXTRA", "").split(",") if b.strip()]
+    for b in [alt] + extras:
+        if b not in bases:
+            bases.append(b)
+    return bases
+
+def _fetch_candles(ativo, par, intervalo):
+    """
+    Busca hedged entre os hosts da Binance (requisicao_hedged.py): o host mais rápido
+    primeiro e, se ele demorar além do percentil de latência, um pedido paralelo no
+    próximo — só se o orçamento de peso tiver saldo na hora.
+    """
+    bases = _bases_binance()
+    prioridade = _prioridade_fetch(ativo, intervalo)
+    espera_max = _espera_max(prioridade)
+    if not ORCAMENTO.reservar(PESO_KLINES, prioridade, timeout=espera_max):
+        print(f"[{ativo}] Sem orçamento de peso da API em {espera_max:.0f}s — ciclo adiado ({par}/{intervalo})")
+        return None
+
+    lock = threading.Lock()
+    pagos = [True]  # peso do 1º pedido já reservado acima
+
+    def _preparar(base):
+        # peso reservado fora do tempo medido: espera por orçamento não é latência do host
+        with lock:
+            pago = bool(pagos) and pagos.pop()
+        if pago or ORCAMENTO.reservar(PESO_KLINES, prioridade, timeout=espera_max):
+            return None
+        return f"[{ativo}] Sem orçamento de peso da API em {espera_max:.0f}s — fallback para {base} adiado"
+
+    def _executar(base):
+        return _try_fetch_klines(ativo, par, intervalo, base)
+
+    def _permitir_hedge():
+        if not ORCAMENTO.reservar(PESO_KLINES, prioridade, timeout=0):
+            return False
+        with lock:
+            pagos.append(True)
+        return True
+
+    response, base, last_err = buscar_hedged(bases, _executar, _permitir_hedge, _preparar)
     if response is None:
         print(f"[{ativo}] Falha final ao obter candles ({par}/{intervalo}). Último erro: {last_err}")
         return None
+    if base != bases[0]:
+        print(f"[{ativo}] Candles via {base}")
     return response.json()
 
 # ========= helpers técnicos
@@ -116,6 +173,137 @@ def _suporte_resistencia_recent(highs, lows, close):
     dist_sup = abs(close[-1] - suporte)     / max(suporte, 1e-9)
     return suporte, resistencia, dist_sup, dist_res
 
+def _inicio_incremental(ultimo_open, opens, fechados):
+    """
+    Índice do 1º candle FECHADO ainda não alimentado (o último candle está em formação).
+    Retorna None se `ultimo_open` não estiver na janela baixada (monitor parado) — recomeçar.
+    """
+    if ultimo_open is None:
+        return 0
+    j = bisect_left(opens, ultimo_open)
+    if j < fechados and opens[j] == ultimo_open:
+        return j + 1
+    return None
+
+# Estado em memória: sem os arquivos do backfill (backfill.py, BACKFILL_DIR) o histórico
+# de S/R e pivôs recomeça dos ~99 candles fechados de um fetch a cada reinício do processo.
+BACKFILL_DIR = os.getenv("BACKFILL_DIR", "dados/klines")
+
+def _historico_local(par, intervalo, antes_de_ms, max_candles=None):
+    """Candles do backfill anteriores à janela baixada (formato carregar_klines); [] se não houver."""
+    try:
+        hist = carregar_klines(par, intervalo, BACKFILL_DIR)
+    except Exception as e:
+        print(f"[{par.upper()}] Erro ao ler histórico local ({intervalo}): {e}")
+        return []
+    hist = [k for k in hist if k[0] < antes_de_ms]
+    return hist[-max_candles:] if max_candles else hist
+
+def _emenda_sem_buraco(hist, opens):
+    """True se o histórico local termina exatamente no candle anterior à janela baixada."""
+    return bool(hist) and len(opens) > 1 and hist[-1][0] + (opens[1] - opens[0]) == opens[0]
+
+def _novo_estado_divergencia(par, intervalo, opens):
+    janela = int(os.getenv("DIVERG_PIVOT_JANELA", "3"))
+    max_dist = int(os.getenv("DIVERG_MAX_DIST", "60"))
+    st = {
+        "ultimo_open": None,
+        "obv_ref": 0.0,
+        "close_ref": None,
+        "rsi":  DivergenciaIncremental(janela, max_dist),
+        "obv":  DivergenciaIncremental(janela, max_dist),
+        "macd": DivergenciaIncremental(janela, max_dist),
+    }
+    # só os pivôs recentes importam (max_dist), então basta a cauda do histórico — e só se
+    # ela emendar na janela: pivôs de dias atrás não podem parecer estar a poucas barras
+    hist = _historico_local(par, intervalo, opens[0], max_candles=int(os.getenv("DIVERG_HIST_MAX", "500")))
+    if len(hist) < 50 or not _emenda_sem_buraco(hist, opens):
+        return st
+    close = [k[4] for k in hist]
+    rsi = calcular_rsi(close)
+    obv = calcular_obv(close, [k[5] for k in hist])
+    _, _, macd_hist = calcular_macd(close)
+    for i, k in enumerate(hist):
+        st["rsi"].atualizar(k[2], k[3], rsi[i])
+        st["obv"].atualizar(k[2], k[3], obv[i])
+        st["macd"].atualizar(k[2], k[3], macd_hist[i])
+    st["obv_ref"], st["close_ref"] = obv[-1], close[-1]
+    return st
+
+def _divergencias_incrementais(ativo, par, intervalo, dados, highs, lows, close, volume, rsi, obv, macd_hist):
+    """
+    Divergências por pivôs, mantendo estado entre ciclos: só candles fechados novos são
+    alimentados. OBV é cumulativo a partir do 1º candle baixado, então é reancorado no
+    último valor já alimentado (ou no fim do histórico local, ao semear).
+    """
+    k = f"{ativo}:{intervalo}"
+    opens = [int(c[0]) for c in dados]
+    fechados = len(dados) - 1
+    st = _DIVERG_STATE.get(k) or _novo_estado_divergencia(par, intervalo, opens)
+
+    inicio = _inicio_incremental(st["ultimo_open"], opens, fechados)
+    if inicio is None:
+        st, inicio = _novo_estado_divergencia(par, intervalo, opens), 0
+    if inicio > 0:
+        offset_obv = st["obv_ref"] - obv[inicio - 1]
+    elif st["close_ref"] is not None:
+        # continua o OBV do histórico: o 1º candle da janela soma/subtrai o próprio volume
+        passo = volume[0] if close[0] > st["close_ref"] else (-volume[0] if close[0] < st["close_ref"] else 0.0)
+        offset_obv = st["obv_ref"] + passo - obv[0]
+    else:
+        offset_obv = 0.0
+
+    for i in range(inicio, fechados):
+        o = obv[i] + offset_obv
+        st["rsi"].atualizar(highs[i], lows[i], rsi[i])
+        st["obv"].atualizar(highs[i], lows[i], o)
+        st["macd"].atualizar(highs[i], lows[i], macd_hist[i])
+        st["ultimo_open"], st["obv_ref"] = opens[i], o
+
+    _DIVERG_STATE[k] = st
+    return st["rsi"].estado(), st["obv"].estado(), st["macd"].estado()
+
+def _novo_estado_sr(par, intervalo, opens):
+    mapa = MapaSuporteResistencia(
+        passo_pct=float(os.getenv("SR_PASSO_PCT", "0.25")),
+        tolerancia_pct=float(os.getenv("SR_TOLERANCIA_PCT", "0.5")),
+        min_toques=int(os.getenv("SR_MIN_TOQUES", "2")),
+    )
+    # o histograma aceita todo o histórico; o detector de pivôs só se ele emendar na janela
+    # (senão o fim do arquivo colado na janela ao vivo inventaria topos/fundos na emenda)
+    hist = _historico_local(par, intervalo, opens[0])
+    com_pivos = _emenda_sem_buraco(hist, opens)
+    for k in hist:
+        mapa.atualizar(k[2], k[3], k[5], pivos=com_pivos)
+    return {"ultimo_open": None, "mapa": mapa}
+
+def _suporte_resistencia(ativo, par, intervalo, dados, highs, lows, close, volume):
+    """
+    S/R do perfil de volume + clusters de pivôs (suporte_resistencia.py), semeado com o
+    histórico do backfill e alimentado de forma incremental. Se faltar nível de um dos
+    lados, cai no S/R dos últimos 5 candles.
+    """
+    k = f"{ativo}:{intervalo}"
+    opens = [int(c[0]) for c in dados]
+    fechados = len(dados) - 1
+    st = _SR_STATE.get(k) or _novo_estado_sr(par, intervalo, opens)
+
+    inicio = _inicio_incremental(st["ultimo_open"], opens, fechados)
+    if inicio is None:
+        st, inicio = _novo_estado_sr(par, intervalo, opens), 0
+    for i in range(inicio, fechados):
+        st["mapa"].atualizar(highs[i], lows[i], volume[i])
+        st["ultimo_open"] = opens[i]
+    _SR_STATE[k] = st
+
+    suporte, resistencia = st["mapa"].mais_proximos(close[-1])
+    sup_rec, res_rec, _, _ = _suporte_resistencia_recent(highs, lows, close)
+    suporte = sup_rec if suporte is None else suporte
+    resistencia = res_rec if resistencia is None else resistencia
+    dist_res = abs(close[-1] - resistencia) / max(resistencia, 1e-9)
+    dist_sup = abs(close[-1] - suporte)     / max(suporte, 1e-9)
+    return suporte, resistencia, dist_sup, dist_res
+
 def _slope(series, lookback=3):
     if len(series) < lookback + 1:
         return 0.0
@@ -174,9 +362,10 @@ def analisar_ativos(ativo, par, intervalo, webhook_url):
     spread_vs_ma = calcular_spread_vs_ma(close_prices, mavg)
     vol_pct = calcular_volatilidade_pct(close_prices, window=20)
 
-    # Divergências
-    div_rsi, tipo_div_rsi = detectar_divergencia_rsi(close_prices, rsi)
-    div_obv, tipo_div_obv = detectar_divergencia_obv(close_prices, obv)
+    # Divergências (pivôs de preço x RSI/OBV/MACD, incremental por ativo/intervalo)
+    (div_rsi, tipo_div_rsi), (div_obv, tipo_div_obv), (div_macd, tipo_div_macd) = _divergencias_incrementais(
+        ativo, par, intervalo, dados, high_prices, low_prices, close_prices, volume, rsi, obv, macd_hist
+    )
 
     # Padrões
     pad_martelo     = detectar_martelo(open_prices, high_prices, low_prices, close_prices)
@@ -199,8 +388,10 @@ def analisar_ativos(ativo, par, intervalo, webhook_url):
     # S&O
     _, liberado, direcao = detectar_squeeze_overextension(close_prices)
 
-    # S/R e reentrada
-    suporte, resistencia, dist_sup, dist_res = _suporte_resistencia_recent(high_prices, low_prices, close_prices)
+    # S/R (perfil de volume + pivôs) e reentrada
+    suporte, resistencia, dist_sup, dist_res = _suporte_resistencia(
+        ativo, par, intervalo, dados, high_prices, low_prices, close_prices, volume
+    )
     reentrou_acima, reentrou_abaixo = _is_reentrada_bollinger(close_prices, hband, lband)
 
     # Tendências curtas
@@ -232,6 +423,8 @@ def analisar_ativos(ativo, par, intervalo, webhook_url):
         criterios_fundo += 1; explic_fundo.append("Divergência RSI (alta)")
     if div_obv and tipo_div_obv == "alta":
         criterios_fundo += 1; explic_fundo.append("Divergência OBV (alta)")
+    if div_macd and tipo_div_macd == "alta":
+        criterios_fundo += 1; explic_fundo.append("Divergência MACD (alta)")
     if (pad_martelo or pad_estrela_man or pad_engolfo) and dist_sup < 0.01:
         criterios_fundo += 1; explic_fundo.append("Candle de reversão em suporte ±1%")
     if reentrou_abaixo:
@@ -246,6 +439,8 @@ def analisar_ativos(ativo, par, intervalo, webhook_url):
         criterios_topo += 1; explic_topo.append("Divergência RSI (baixa)")
     if div_obv and tipo_div_obv == "baixa":
         criterios_topo += 1; explic_topo.append("Divergência OBV (baixa)")
+    if div_macd and tipo_div_macd == "baixa":
+        criterios_topo += 1; explic_topo.append("Divergência MACD (baixa)")
     if (pad_estrela_noi or pad_engolfo or pad_3corvos) and dist_res < 0.01:
         criterios_topo += 1; explic_topo.append("Candle de reversão em resistência ±1%")
     if reentrou_acima:
@@ -314,6 +509,7 @@ def analisar_ativos(ativo, par, intervalo, webhook_url):
         f"obv_last={obv[-1]:.0f}\n"
         f"divergencia_rsi={tipo_div_rsi if div_rsi else 'nenhuma'}\n"
         f"divergencia_obv={tipo_div_obv if div_obv else 'nenhuma'}\n"
+        f"divergencia_macd={tipo_div_macd if div_macd else 'nenhuma'}\n"
         f"bollinger_ma={mavg[-1]:.2f}\n"
         f"bollinger_sup={hband[-1]:.2f}\n"
         f"bollinger_inf={lband[-1]:.2f}\n"
@@ -0,0 +1,185 @@
+# backfill.py — download histórico de klines (paginado, paralelo, retomável)
+#
+# Uso:
+#   python backfill.py --simbolos btcusdt,ethusdt --intervalos 1h,4h --inicio 2021-01-01
+#
+# Arquivos: <pasta>/<SIMBOLO>_<intervalo>.csv.gz, um membro gzip por página. Ao retomar,
+# o arquivo é cortado no fim do último membro completo (escrita interrompida) e o
+# download continua a partir do último openTime gravado.
+import os, gzip, zlib, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from orcamento_api import ORCAMENTO, BAIXA, PESO_KLINES, binance_get
+
+load_dotenv()
+
+LIMITE_PAGINA = 1000
+COLUNAS = ("open_time", "open", "high", "low", "close", "volume", "close_time")
+
+
+# ========= arquivos locais
+def _caminho(pasta, simbolo, intervalo):
+    return os.path.join(pasta, f"{simbolo.upper()}_{intervalo}.csv.gz")
+
+def _membros_gzip(arq, bloco_bytes=1 << 16):
+    """
+    Itera (fim_em_bytes, texto) de cada membro gzip COMPLETO do arquivo.
+    Para no 1º membro truncado/corrompido (escrita interrompida) sem levantar erro.
+    """
+    with open(arq, "rb") as f:
+        d, partes, lido = zlib.decompressobj(wbits=31), [], 0
+        bloco = f.read(bloco_bytes)
+        while bloco:
+            try:
+                partes.append(d.decompress(bloco))
+            except zlib.error:
+                return
+            if d.eof:
+                resto = d.unused_data
+                lido += len(bloco) - len(resto)
+                yield lido, b"".join(partes).decode("utf-8")
+                d, partes = zlib.decompressobj(wbits=31), []
+                bloco = resto or f.read(bloco_bytes)
+            else:
+                lido += len(bloco)
+                bloco = f.read(bloco_bytes)
+
+def _reparar_e_ultimo_open(pasta, simbolo, intervalo):
+    """Corta o arquivo no último membro completo e devolve o último openTime gravado (ou None)."""
+    arq = _caminho(pasta, simbolo, intervalo)
+    if not os.path.exists(arq):
+        return None
+    fim, ultimo = 0, None
+    for fim, texto in _membros_gzip(arq):
+        linhas = texto.rstrip("\n").rsplit("\n", 1)
+        if linhas[-1]:
+            ultimo = int(linhas[-1].split(",", 1)[0])
+    tamanho = os.path.getsize(arq)
+    if fim < tamanho:
+        print(f"[BACKFILL] {simbolo.upper()} {intervalo}: descartando {tamanho - fim} bytes "
+              f"de escrita interrompida", flush=True)
+        with open(arq, "r+b") as f:
+            f.truncate(fim)
+    return ultimo
+
+def _gravar_pagina(pasta, simbolo, intervalo, klines):
+    linhas = "".join(",".join(str(k[i]) for i in range(len(COLUNAS))) + "\n" for k in klines)
+    with gzip.open(_caminho(pasta, simbolo, intervalo), "at", encoding="utf-8") as f:
+        f.write(linhas)
+
+def carregar_klines(simbolo, intervalo, pasta="dados/klines"):
+    """
+    Lê o arquivo do backfill e devolve klines no formato da Binance
+    ([openTime, open, high, low, close, volume, closeTime]), ordenados e sem duplicatas.
+    Um membro final truncado (backfill interrompido) é ignorado.
+    """
+    arq = _caminho(pasta, simbolo, intervalo)
+    if not os.path.exists(arq):
+        return []
+    por_open = {}
+    for _, texto in _membros_gzip(arq):
+        for linha in texto.splitlines():
+            p = linha.split(",")
+            ot = int(p[0])
+            por_open[ot] = [ot, float(p[1]), float(p[2]), float(p[3]), float(p[4]), float(p[5]), int(p[6])]
+    return [por_open[k] for k in sorted(por_open)]
+
+
+# ========= download
+def _get_pagina(base_url, simbolo, intervalo, inicio_ms, fim_ms, parar=None, tentativas=5):
+    url = f"{base_url.rstrip('/')}/api/v3/klines"
+    params = {"symbol": simbolo.upper(), "interval": intervalo, "startTime": inicio_ms,
+              "endTime": fim_ms, "limit": LIMITE_PAGINA}
+    ultimo_erro = None
+    for t in range(tentativas):
+        try:
+            # BAIXA: só usa o orçamento que sobra acima da reserva dos monitores
+            r = binance_get(url, PESO_KLINES, BAIXA, params=params, timeout=15)
+            if r.status_code == 200:
+                return r.json()
+            ultimo_erro = f"HTTP {r.status_code}: {r.text[:150]}"
+            if 400 <= r.status_code < 500 and r.status_code not in (418, 429):
+                break  # erro do pedido (símbolo/intervalo inválido) — não adianta repetir
+        except Exception as e:
+            ultimo_erro = str(e)
+        if t == tentativas - 1:
+            break
+        espera = min(2 ** t, 30)
+        if parar is not None:
+            if parar.wait(espera):
+                raise RuntimeError(f"interrompido ({ultimo_erro})")
+        else:
+            time.sleep(espera)
+    raise RuntimeError(ultimo_erro)
+
+def baixar_serie(base_url, simbolo, intervalo, inicio_ms, fim_ms, pasta, parar=None):
+    """Baixa (ou retoma) uma série símbolo/intervalo. Retorna nº de candles gravados."""
+    ultimo = _reparar_e_ultimo_open(pasta, simbolo, intervalo)
+    cursor = max(inicio_ms, ultimo + 1) if ultimo is not None else inicio_ms
+    total = 0
+    while cursor <= fim_ms and not (parar and parar.is_set()):
+        pagina = _get_pagina(base_url, simbolo, intervalo, cursor, fim_ms, parar)
+        agora_ms = int(time.time() * 1000)
+        fechados = [k for k in pagina if int(k[6]) < agora_ms]  # não grava candle em formação
+        if fechados:
+            _gravar_pagina(pasta, simbolo, intervalo, fechados)
+            total += len(fechados)
+            cursor = int(fechados[-1][0]) + 1
+        if len(pagina) < LIMITE_PAGINA or len(fechados) < len(pagina):
+            break
+    return total
+
+def _para_ms(data):
+    dt = datetime.strptime(data, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Backfill de klines da Binance (retomável).")
+    ap.add_argument("--simbolos", required=True, help="ex.: btcusdt,ethusdt")
+    ap.add_argument("--intervalos", default="1h", help="ex.: 15m,1h,4h")
+    ap.add_argument("--inicio", required=True, help="AAAA-MM-DD (UTC)")
+    ap.add_argument("--fim", default=None, help="AAAA-MM-DD (UTC); padrão: agora")
+    ap.add_argument("--pasta", default=os.getenv("BACKFILL_DIR", "dados/klines"))
+    ap.add_argument("--base-url", default=os.getenv("BINANCE_BASE_URL", "https://data-api.binance.vision"))
+    ap.add_argument("--workers", type=int, default=int(os.getenv("BACKFILL_WORKERS", "4")))
+    ap.add_argument("--limite-peso", type=int, default=None,
+                    help="limite de peso/min da Binance (padrão: BINANCE_WEIGHT_LIMIT ou 6000)")
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.pasta, exist_ok=True)
+    inicio_ms = _para_ms(args.inicio)
+    fim_ms = _para_ms(args.fim) if args.fim else int(time.time() * 1000)
+    if args.limite_peso:
+        ORCAMENTO.configurar(args.limite_peso)
+    parar = threading.Event()
+    # sem repetição (ex.: btcusdt,BTCUSDT): dois workers na mesma série corromperiam o .csv.gz
+    series = list(dict.fromkeys(
+        (s.strip().lower(), i.strip())
+        for s in args.simbolos.split(",") if s.strip()
+        for i in args.intervalos.split(",") if i.strip()
+    ))
+
+    falhas = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futuros = {
+            pool.submit(baixar_serie, args.base_url, s, i, inicio_ms, fim_ms, args.pasta, parar): (s, i)
+            for s, i in series
+        }
+        try:
+            for fut in as_completed(futuros):
+                s, i = futuros[fut]
+                try:
+                    print(f"[BACKFILL] {s.upper()} {i}: +{fut.result()} candles", flush=True)
+                except Exception as e:
+                    falhas += 1
+                    print(f"[BACKFILL] {s.upper()} {i}: ERRO {e}", flush=True)
+        except KeyboardInterrupt:
+            parar.set()
+            print("[BACKFILL] Interrompido — rode de novo para retomar.", flush=True)
+            raise
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+# conftest.py — servidor HTTP local que imita /api/v3/klines da Binance (para os testes)
+import json, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+HORA_MS = 3600000
+
+
+def _klines(inicio_ms, fim_ms, limite):
+    t = ((inicio_ms + HORA_MS - 1) // HORA_MS) * HORA_MS
+    out = []
+    while t <= fim_ms and len(out) < limite:
+        p = 100 + (t // HORA_MS) % 50
+        out.append([t, str(p), str(p + 1), str(p - 1), str(p + 0.5), "10", t + HORA_MS - 1,
+                    "0", 1, "0", "0", "0"])
+        t += HORA_MS
+    return out
+
+
+@pytest.fixture
+def servidor_klines():
+    """
+    Fábrica: servidor_klines(atraso=0.0, ao_responder=None) -> base_url.
+    `ao_responder(n)` é chamado a cada resposta (n = nº de requisições até ali).
+    """
+    servidores = []
+
+    def _criar(atraso=0.0, ao_responder=None):
+        contador = {"n": 0}
+
+        class _Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                inicio = int(q.get("startTime", 0))
+                fim = int(q.get("endTime", int(time.time() * 1000)))
+                corpo = json.dumps(_klines(inicio, fim, int(q.get("limit", 500)))).encode()
+                time.sleep(atraso)
+                contador["n"] += 1
+                if ao_responder:
+                    ao_responder(contador["n"])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("X-MBX-USED-WEIGHT-1M", "2")
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servidores.append(srv)
+        return f"http://127.0.0.1:{srv.server_address[1]}"
+
+    yield _criar
+    for srv in servidores:
+        srv.shutdown()
+        srv.server_close()
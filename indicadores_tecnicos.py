@@ -91,26 +91,6 @@ def detectar_tres_corvos_negros(open_, high, low, close):
             return True
     return False
 
-# === Divergências ===
-
-def detectar_divergencia_rsi(close, rsi):
-    if len(close) < 5 or len(rsi) < 5:
-        return False, None
-    if close[-1] > close[-3] and rsi[-1] < rsi[-3]:
-        return True, "baixa"
-    if close[-1] < close[-3] and rsi[-1] > rsi[-3]:
-        return True, "alta"
-    return False, None
-
-def detectar_divergencia_obv(close, obv):
-    if len(close) < 5 or len(obv) < 5:
-        return False, None
-    if close[-1] > close[-3] and obv[-1] < obv[-3]:
-        return True, "baixa"
-    if close[-1] < close[-3] and obv[-1] > obv[-3]:
-        return True, "alta"
-    return False, None
-
 # === Squeeze & Overextension (S&O) ===
 
 def detectar_squeeze_overextension(close, window=20):
@@ -0,0 +1,114 @@
+# orcamento_api.py — orçamento de peso da API Binance, compartilhado pelo processo
+#
+# Token bucket único para todos os fetches (monitores, backfill...). O saldo é
+# sincronizado com o X-MBX-USED-WEIGHT-1M das respostas (que é por IP, então
+# enxerga também outros processos) e 418/429 pausam todo mundo pelo Retry-After.
+# Prioridades: trabalho de BAIXA prioridade só consome acima de uma reserva,
+# e espera enquanto houver pedidos mais urgentes na fila.
+import os, time, threading, requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+URGENTE, NORMAL, BAIXA = 0, 1, 2
+PESO_KLINES = int(os.getenv("BINANCE_PESO_KLINES", "2"))
+
+
+class OrcamentoPeso:
+    def __init__(self, limite_minuto=6000, margem=0.8, reserva_normal=0.2, reserva_baixa=0.5):
+        self._cond = threading.Condition()
+        self.margem = margem
+        self.configurar(limite_minuto)
+        # fração da capacidade que cada prioridade precisa deixar sobrando
+        self._reserva = {URGENTE: 0.0, NORMAL: reserva_normal, BAIXA: reserva_baixa}
+        self._esperando = {URGENTE: 0, NORMAL: 0, BAIXA: 0}
+        self._pausa_ate = 0.0
+
+    def configurar(self, limite_minuto, margem=None):
+        """Troca o limite/min (e a margem, se dada; senão mantém a atual — ex.: BINANCE_WEIGHT_MARGEM)."""
+        with self._cond:
+            if margem is not None:
+                self.margem = margem
+            self.capacidade = float(limite_minuto) * self.margem
+            self._taxa = self.capacidade / 60.0  # reabastecimento por segundo
+            self._saldo = self.capacidade
+            self._ts = time.monotonic()
+            self._cond.notify_all()
+
+    @classmethod
+    def do_env(cls):
+        return cls(
+            limite_minuto=int(os.getenv("BINANCE_WEIGHT_LIMIT", "6000")),
+            margem=float(os.getenv("BINANCE_WEIGHT_MARGEM", "0.8")),
+        )
+
+    def _reabastecer(self):
+        agora = time.monotonic()
+        self._saldo = min(self.capacidade, self._saldo + (agora - self._ts) * self._taxa)
+        self._ts = agora
+
+    def _pode(self, peso, prioridade):
+        if time.time() < self._pausa_ate:
+            return False
+        if any(self._esperando[p] for p in range(prioridade)):
+            return False
+        return self._saldo - peso >= self.capacidade * self._reserva[prioridade]
+
+    def reservar(self, peso, prioridade=NORMAL, timeout=None):
+        """Bloqueia até haver saldo. Retorna False se `timeout` (s) estourar."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._esperando[prioridade] += 1
+            try:
+                while True:
+                    self._reabastecer()
+                    if self._pode(peso, prioridade):
+                        self._saldo -= peso
+                        return True
+                    falta = peso + self.capacidade * self._reserva[prioridade] - self._saldo
+                    espera = max(falta / self._taxa, self._pausa_ate - time.time(), 0.05)
+                    if limite is not None:
+                        resta = limite - time.monotonic()
+                        if resta <= 0:
+                            return False
+                        espera = min(espera, resta)
+                    self._cond.wait(min(espera, 5))
+            finally:
+                self._esperando[prioridade] -= 1
+                self._cond.notify_all()
+
+    def registrar(self, r):
+        """Atualiza o saldo com os headers/status de uma resposta da Binance."""
+        usado = r.headers.get("X-MBX-USED-WEIGHT-1M") or r.headers.get("X-MBX-USED-WEIGHT")
+        with self._cond:
+            self._reabastecer()
+            if usado and str(usado).isdigit():
+                self._saldo = min(self._saldo, self.capacidade - int(usado))
+            if r.status_code in (418, 429):
+                retry = r.headers.get("Retry-After", "")
+                pausa = int(retry) if retry.isdigit() else (300 if r.status_code == 418 else 60)
+                self._pausa_ate = max(self._pausa_ate, time.time() + pausa)
+                print(f"[API] HTTP {r.status_code} da Binance — pausando requisições por {pausa}s", flush=True)
+            self._cond.notify_all()
+
+    @property
+    def saldo(self):
+        with self._cond:
+            self._reabastecer()
+            return self._saldo
+
+
+ORCAMENTO = OrcamentoPeso.do_env()
+
+
+def binance_get(url, peso=PESO_KLINES, prioridade=NORMAL, espera_max=None, reservado=False, **kwargs):
+    """
+    requests.get passando pelo orçamento compartilhado (`reservado=True` se o peso
+    já foi reservado antes). Retorna None se não houver saldo em `espera_max`
+    segundos (trabalho adiado).
+    """
+    if not reservado and not ORCAMENTO.reservar(peso, prioridade, timeout=espera_max):
+        return None
+    r = requests.get(url, **kwargs)
+    ORCAMENTO.registrar(r)
+    return r
@@ -0,0 +1,123 @@
+# pivos.py — pivôs (swing highs/lows) em tempo linear + divergências incrementais
+from collections import deque
+
+
+class DetectorPivos:
+    """
+    Detecta pivôs de uma série com janela simétrica de `janela` barras de cada lado.
+    Usa deques monotônicas (máximo/mínimo deslizante), então cada nova barra custa O(1)
+    amortizado. Um pivô só é confirmado `janela` barras depois de acontecer.
+    """
+
+    def __init__(self, janela=3):
+        self.janela = max(1, int(janela))
+        self._tam = 2 * self.janela + 1
+        self._idx = -1
+        self._max = deque()  # (idx, valor) com valores decrescentes
+        self._min = deque()  # (idx, valor) com valores crescentes
+
+    def atualizar(self, alto, baixo=None):
+        """
+        Alimenta uma barra (alto/baixo; se `baixo` for None usa o mesmo valor).
+        Retorna lista de pivôs confirmados: [("topo"|"fundo", idx, valor), ...]
+        """
+        if baixo is None:
+            baixo = alto
+        self._idx += 1
+        i = self._idx
+        inicio = i - self._tam + 1
+
+        # em empates fica o mais recente — evita pivô duplo em platôs
+        while self._max and self._max[-1][1] <= alto:
+            self._max.pop()
+        self._max.append((i, alto))
+        while self._max[0][0] < inicio:
+            self._max.popleft()
+
+        while self._min and self._min[-1][1] >= baixo:
+            self._min.pop()
+        self._min.append((i, baixo))
+        while self._min[0][0] < inicio:
+            self._min.popleft()
+
+        if inicio < 0:
+            return []
+        centro = i - self.janela
+        pivos = []
+        if self._max[0][0] == centro:
+            pivos.append(("topo", centro, self._max[0][1]))
+        if self._min[0][0] == centro:
+            pivos.append(("fundo", centro, self._min[0][1]))
+        return pivos
+
+    @property
+    def barras(self):
+        return self._idx + 1
+
+
+class DivergenciaIncremental:
+    """
+    Divergência clássica entre pivôs de preço e um indicador (RSI/OBV/MACD...).
+      - "baixa": preço faz topo mais alto e o indicador topo mais baixo
+      - "alta":  preço faz fundo mais baixo e o indicador fundo mais alto
+    Só compara os dois últimos pivôs do mesmo tipo, separados por no máximo
+    `max_distancia` barras, e só sinaliza se o último pivô tiver no máximo
+    `max_idade` barras. Cada nova barra faz apenas trabalho local.
+    """
+
+    def __init__(self, janela=3, max_distancia=60, max_idade=None):
+        self.janela = max(1, int(janela))
+        self.max_distancia = int(max_distancia)
+        self.max_idade = int(max_idade) if max_idade is not None else 2 * self.janela
+        self._pivos = DetectorPivos(self.janela)
+        self._ind = deque(maxlen=self.janela + 1)  # indicador das últimas barras (até o centro)
+        self._topos = deque(maxlen=2)   # (idx, preco, indicador)
+        self._fundos = deque(maxlen=2)
+
+    def atualizar(self, alto, baixo, indicador):
+        """Alimenta uma barra (preço alto/baixo + valor do indicador)."""
+        self._ind.append(indicador)
+        for tipo, idx, valor in self._pivos.atualizar(alto, baixo):
+            ind_pivo = self._ind[0]  # valor do indicador na barra central (idx)
+            if ind_pivo is None or ind_pivo != ind_pivo:  # None/NaN (aquecimento do indicador)
+                continue
+            (self._topos if tipo == "topo" else self._fundos).append((idx, valor, ind_pivo))
+
+    def _par_valido(self, pares):
+        if len(pares) < 2:
+            return False
+        (i0, _, _), (i1, _, _) = pares
+        idade = self._pivos.barras - 1 - i1
+        return (i1 - i0) <= self.max_distancia and idade <= self.max_idade
+
+    def estado(self):
+        """Retorna (True, "alta"|"baixa") ou (False, None), priorizando o pivô mais recente."""
+        candidatos = []
+        if self._par_valido(self._topos):
+            (_, p0, v0), (i1, p1, v1) = self._topos
+            if p1 > p0 and v1 < v0:
+                candidatos.append((i1, "baixa"))
+        if self._par_valido(self._fundos):
+            (_, p0, v0), (i1, p1, v1) = self._fundos
+            if p1 < p0 and v1 > v0:
+                candidatos.append((i1, "alta"))
+        if not candidatos:
+            return False, None
+        return True, max(candidatos)[1]
+
+
+def detectar_divergencia(close, indicador, high=None, low=None, janela=3, max_distancia=60, max_idade=None):
+    """
+    Versão em lote (O(n)) de DivergenciaIncremental para uma série completa.
+    Sem high/low usa o próprio close para os pivôs de preço.
+    """
+    n = min(len(close), len(indicador))
+    if n < 2 * janela + 2:
+        return False, None
+    high = close if high is None else high
+    low = close if low is None else low
+    div = DivergenciaIncremental(janela=janela, max_distancia=max_distancia, max_idade=max_idade)
+    off_c, off_i = len(close) - n, len(indicador) - n
+    for k in range(n):
+        div.atualizar(float(high[off_c + k]), float(low[off_c + k]), indicador[off_i + k])
+    return div.estado()
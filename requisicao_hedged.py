@@ -0,0 +1,143 @@
+# requisicao_hedged.py — requisições "hedged" entre vários hosts + estatística de latência
+#
+# Dispara no host mais rápido (pelas latências recentes); se ele não responder dentro
+# do percentil HEDGE_PERCENTIL da sua latência, dispara também no próximo host.
+# Falha de um host dispara o próximo na hora. Fica a 1ª resposta boa; os pedidos
+# ainda na fila são cancelados e os que já estavam em voo têm a resposta descartada.
+import os, time, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HEDGE_PERCENTIL = float(os.getenv("HEDGE_PERCENTIL", "90"))
+HEDGE_MIN_S     = float(os.getenv("HEDGE_MIN_S", "0.3"))
+HEDGE_MAX_S     = float(os.getenv("HEDGE_MAX_S", "3.0"))
+HEDGE_PADRAO_S  = float(os.getenv("HEDGE_PADRAO_S", "1.0"))  # sem amostras suficientes
+HEDGE_AMOSTRAS  = int(os.getenv("HEDGE_AMOSTRAS", "50"))
+
+HEDGE_POLL_S    = 0.05
+
+# Pool compartilhado por todos os monitores; o tempo na fila (ou esperando orçamento)
+# não conta para o hedge — o relógio só começa quando o pedido sai de fato.
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", "16")), thread_name_prefix="hedge")
+_LOCK = threading.Lock()
+_STATS = {}  # { host: {"lat": deque[s], "falhas": int} }
+
+
+# ========= estatística por host
+def registrar_latencia(host, segundos, ok):
+    with _LOCK:
+        st = _STATS.setdefault(host, {"lat": deque(maxlen=HEDGE_AMOSTRAS), "falhas": 0})
+        if ok:
+            st["lat"].append(segundos)
+            st["falhas"] = 0
+        else:
+            st["falhas"] += 1
+
+def _percentil(valores, p):
+    v = sorted(valores)
+    return v[min(len(v) - 1, int(round(p / 100.0 * (len(v) - 1))))]
+
+def atraso_hedge(host):
+    """Quanto esperar pelo host antes de disparar o pedido de reserva."""
+    with _LOCK:
+        lat = list(_STATS.get(host, {}).get("lat", ()))
+    if len(lat) < 5:
+        return HEDGE_PADRAO_S
+    return min(HEDGE_MAX_S, max(HEDGE_MIN_S, _percentil(lat, HEDGE_PERCENTIL)))
+
+def ordenar_hosts(hosts):
+    """Mediana da latência (penalizada por falhas seguidas); empate mantém a ordem dada."""
+    def _score(host):
+        with _LOCK:
+            st = _STATS.get(host)
+            lat = list(st["lat"]) if st else []
+            falhas = st["falhas"] if st else 0
+        base = _percentil(lat, 50) if lat else HEDGE_PADRAO_S
+        return base * (1 + falhas)
+    return sorted(hosts, key=lambda h: (_score(h), hosts.index(h)))
+
+def estatisticas():
+    with _LOCK:
+        return {h: {"amostras": len(st["lat"]),
+                    "p50": _percentil(st["lat"], 50) if st["lat"] else None,
+                    "falhas": st["falhas"]} for h, st in _STATS.items()}
+
+
+# ========= requisição hedged
+def _descartar(fut):
+    try:
+        resp, _ = fut.result()
+        if resp is not None and hasattr(resp, "close"):
+            resp.close()
+    except Exception:
+        pass
+
+def _executar_medindo(executar, preparar, disparo):
+    host = disparo["host"]
+    if preparar is not None:
+        err = preparar(host)
+        if err is not None:
+            return None, err  # recurso local (ex.: orçamento), não é falha do host
+    disparo["t0"] = t0 = time.monotonic()
+    try:
+        resp, err = executar(host)
+    except Exception as e:
+        resp, err = None, str(e)
+    registrar_latencia(host, time.monotonic() - t0, resp is not None)
+    return resp, err
+
+def buscar_hedged(hosts, executar, permitir_hedge=None, preparar=None):
+    """
+    `executar(host)` -> (resposta | None, erro). Retorna (resposta, host, ultimo_erro).
+    `preparar(host)` roda antes do relógio começar (ex.: reservar peso) e devolve None
+    ou uma mensagem de erro — nesse caso o pedido não sai e o host não é penalizado.
+    `permitir_hedge()` é consultado antes de cada pedido especulativo (disparado por
+    tempo, não por falha) e pode vetá-lo — ex.: sem orçamento de peso sobrando.
+    """
+    fila = ordenar_hosts(list(hosts))
+    pendentes = {}
+    ultimo_err = None
+
+    def _disparar():
+        disparo = {"host": fila.pop(0), "t0": None}
+        pendentes[_POOL.submit(_executar_medindo, executar, preparar, disparo)] = disparo
+        return disparo
+
+    def _prazo_hedge(disparo):
+        # None enquanto o pedido ainda não saiu (fila do pool / preparar)
+        return None if disparo["t0"] is None else disparo["t0"] + atraso_hedge(disparo["host"])
+
+    ultimo = _disparar()
+    hedge_vetado = False
+    try:
+        while pendentes:
+            espera = None
+            if fila and not hedge_vetado:
+                prazo = _prazo_hedge(ultimo)
+                espera = HEDGE_POLL_S if prazo is None else max(0.0, prazo - time.monotonic())
+            feitos, _ = wait(list(pendentes), timeout=espera, return_when=FIRST_COMPLETED)
+            if not feitos:
+                prazo = _prazo_hedge(ultimo)
+                if prazo is None or time.monotonic() < prazo:
+                    continue
+                if permitir_hedge is None or permitir_hedge():
+                    ultimo = _disparar()
+                else:
+                    hedge_vetado = True  # só aguarda o que já está em voo (ou falha)
+                continue
+            for fut in feitos:
+                disparo = pendentes.pop(fut)
+                resp, err = fut.result()
+                if resp is not None:
+                    return resp, disparo["host"], None
+                ultimo_err = err
+            if fila:
+                ultimo = _disparar()  # falhou: próximo host sem esperar
+        return None, None, ultimo_err
+    finally:
+        for fut in pendentes:
+            if not fut.cancel():
+                fut.add_done_callback(_descartar)
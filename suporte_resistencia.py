@@ -0,0 +1,98 @@
+# suporte_resistencia.py — S/R por perfil de volume + clusters de pivôs (incremental)
+import math
+from bisect import bisect_left, bisect_right
+
+from pivos import DetectorPivos
+
+
+class MapaSuporteResistencia:
+    """
+    Mantém, candle a candle:
+      - histograma volume x preço (faixas log de `passo_pct`%), volume do candle
+        distribuído uniformemente entre a mínima e a máxima;
+      - clusters de pivôs (topos/fundos) agrupados por `tolerancia_pct`%.
+    Os níveis (nós de volume + clusters com >= `min_toques`) ficam num índice
+    ordenado, reconstruído só quando entra candle novo; a consulta é O(log n).
+    """
+
+    def __init__(self, passo_pct=0.25, janela_pivo=3, tolerancia_pct=0.5, min_toques=2, max_nos_volume=12):
+        self._passo = math.log1p(passo_pct / 100.0)
+        self._tol = math.log1p(tolerancia_pct / 100.0)
+        self.min_toques = int(min_toques)
+        self.max_nos_volume = int(max_nos_volume)
+        self._volume = {}    # faixa -> volume acumulado
+        self._clusters = {}  # faixa (tolerância) -> [soma_log_preco, toques]
+        self._pivos = DetectorPivos(janela_pivo)
+        self._niveis = []
+        self._sujo = False
+
+    def _faixa(self, preco, passo):
+        return int(math.floor(math.log(max(preco, 1e-12)) / passo))
+
+    def atualizar(self, alto, baixo, volume, pivos=True):
+        """
+        Alimenta um candle FECHADO. `pivos=False` só acumula volume — para histórico que
+        não emenda sem buraco nos candles seguintes (o detector de pivôs supõe barras contíguas).
+        """
+        f0, f1 = self._faixa(baixo, self._passo), self._faixa(alto, self._passo)
+        parcela = volume / (f1 - f0 + 1)
+        for f in range(f0, f1 + 1):
+            self._volume[f] = self._volume.get(f, 0.0) + parcela
+
+        if not pivos:
+            self._sujo = True
+            return
+        for _, _, preco in self._pivos.atualizar(alto, baixo):
+            lp = math.log(max(preco, 1e-12))
+            c = self._clusters.setdefault(int(math.floor(lp / self._tol)), [0.0, 0])
+            c[0] += lp
+            c[1] += 1
+        self._sujo = True
+
+    def _nos_volume(self):
+        # nós = máximos locais do histograma, os `max_nos_volume` mais pesados
+        nos = []
+        for f, v in self._volume.items():
+            if v >= self._volume.get(f - 1, 0.0) and v >= self._volume.get(f + 1, 0.0):
+                nos.append((v, f))
+        nos.sort(reverse=True)
+        return [(f + 0.5) * self._passo for _, f in nos[:self.max_nos_volume]]
+
+    def _agrupar(self, itens):
+        """
+        Agrupa (log_preco, peso) ordenados: um item entra no grupo se estiver a no máximo
+        `tolerancia` do 1º item (âncora) do grupo — assim o grupo nunca se estende em cadeia.
+        Retorna [(log_preco médio ponderado, peso total), ...].
+        """
+        grupos = []
+        for lp, peso in sorted(itens):
+            if grupos and lp - grupos[-1][0] <= self._tol:
+                grupos[-1][1] += lp * peso
+                grupos[-1][2] += peso
+            else:
+                grupos.append([lp, lp * peso, peso])
+        return [(soma / peso, peso) for _, soma, peso in grupos]
+
+    def _indexar(self):
+        # clusters de pivôs vizinhos (ex.: toques dos dois lados da borda de uma faixa)
+        # são unidos antes de exigir `min_toques`
+        pivos = self._agrupar([(soma / toques, toques) for soma, toques in self._clusters.values()])
+        logs = [lp for lp, toques in pivos if toques >= self.min_toques]
+        logs += self._nos_volume()
+        self._niveis = [math.exp(lp) for lp, _ in self._agrupar([(lp, 1) for lp in logs])]
+        self._sujo = False
+
+    @property
+    def niveis(self):
+        if self._sujo:
+            self._indexar()
+        return self._niveis
+
+    def mais_proximos(self, preco):
+        """Retorna (suporte, resistencia) mais próximos de `preco` (None se não houver)."""
+        niveis = self.niveis
+        i = bisect_right(niveis, preco)
+        j = bisect_left(niveis, preco)
+        suporte = niveis[i - 1] if i > 0 else None
+        resistencia = niveis[j] if j < len(niveis) else None
+        return suporte, resistencia
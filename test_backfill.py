@@ -0,0 +1,82 @@
+import os, threading, time
+
+import pytest
+
+import backfill
+
+HORA_MS = 3600000
+INICIO = backfill._para_ms("2020-01-01")
+FIM = INICIO + 3499 * HORA_MS  # 3500 candles = 4 páginas
+
+
+def _checar_completo(pasta):
+    klines = backfill.carregar_klines("btcusdt", "1h", pasta)
+    opens = [k[0] for k in klines]
+    assert opens == list(range(INICIO, FIM + 1, HORA_MS))
+
+
+def test_backfill_interrompido_retoma_sem_buracos(tmp_path, servidor_klines):
+    pasta = str(tmp_path)
+    parar = threading.Event()
+    base = servidor_klines(ao_responder=lambda n: n >= 2 and parar.set())
+
+    gravados = backfill.baixar_serie(base, "btcusdt", "1h", INICIO, FIM, pasta, parar)
+    assert gravados == 2 * backfill.LIMITE_PAGINA
+
+    restantes = backfill.baixar_serie(base, "btcusdt", "1h", INICIO, FIM, pasta)
+    assert gravados + restantes == 3500
+    _checar_completo(pasta)
+
+
+def test_backfill_retoma_apos_escrita_truncada(tmp_path, servidor_klines):
+    pasta = str(tmp_path)
+    parar = threading.Event()
+    base = servidor_klines(ao_responder=lambda n: n >= 2 and parar.set())
+    backfill.baixar_serie(base, "btcusdt", "1h", INICIO, FIM, pasta, parar)
+
+    # simula queda no meio da escrita da 2ª página
+    arq = backfill._caminho(pasta, "btcusdt", "1h")
+    with open(arq, "r+b") as f:
+        f.truncate(os.path.getsize(arq) - 30)
+    assert len(backfill.carregar_klines("btcusdt", "1h", pasta)) == backfill.LIMITE_PAGINA
+
+    restantes = backfill.baixar_serie(base, "btcusdt", "1h", INICIO, FIM, pasta)
+    assert restantes == 3500 - backfill.LIMITE_PAGINA
+    _checar_completo(pasta)
+
+
+def test_main_nao_duplica_series(tmp_path, servidor_klines):
+    requisicoes = []
+    base = servidor_klines(ao_responder=requisicoes.append)
+    rc = backfill.main(["--simbolos", "btcusdt,BTCUSDT, btcusdt", "--intervalos", "1h,1h",
+                        "--inicio", "2020-01-01", "--fim", "2020-05-27",
+                        "--pasta", str(tmp_path), "--base-url", base])
+    assert rc == 0
+    # 2020-01-01 .. 2020-05-27 00:00 = 3529 candles = 4 páginas, uma única vez
+    assert len(requisicoes) == 4
+    assert len(backfill.carregar_klines("btcusdt", "1h", str(tmp_path))) == 3529
+
+
+def _porta_fechada():
+    import socket
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    porta = s.getsockname()[1]
+    s.close()
+    return f"http://127.0.0.1:{porta}"
+
+
+def test_ultima_tentativa_nao_espera_backoff():
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError):
+        backfill._get_pagina(_porta_fechada(), "btcusdt", "1h", INICIO, FIM, tentativas=1)
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_parar_interrompe_o_backoff():
+    parar = threading.Event()
+    threading.Timer(0.2, parar.set).start()
+    t0 = time.monotonic()
+    with pytest.raises(RuntimeError, match="interrompido"):
+        backfill._get_pagina(_porta_fechada(), "btcusdt", "1h", INICIO, FIM, parar, tentativas=5)
+    assert time.monotonic() - t0 < 1.0
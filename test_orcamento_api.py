@@ -0,0 +1,64 @@
+import threading, time
+
+from orcamento_api import OrcamentoPeso, URGENTE, NORMAL, BAIXA
+
+
+class _Resposta:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def test_baixa_e_normal_respeitam_a_reserva():
+    o = OrcamentoPeso(limite_minuto=60, margem=1.0, reserva_normal=0.2, reserva_baixa=0.5)
+    assert o.reservar(25, BAIXA, timeout=0.05)                # 60 -> 35 (>= 30)
+    assert not o.reservar(10, BAIXA, timeout=0.05)            # deixaria 25 < 30
+    assert o.reservar(20, NORMAL, timeout=0.05)               # 35 -> 15 (>= 12)
+    assert not o.reservar(5, NORMAL, timeout=0.05)            # deixaria 10 < 12
+    assert o.reservar(14, URGENTE, timeout=0.05)              # urgente pode ir até 0
+
+
+def test_prioridade_menor_espera_urgente_na_fila():
+    o = OrcamentoPeso(limite_minuto=600, margem=1.0, reserva_normal=0.0)  # 10/s
+    assert o.reservar(600, URGENTE)
+    ordem = []
+
+    def _pedir(prioridade, peso, nome):
+        o.reservar(peso, prioridade)
+        ordem.append(nome)
+
+    urgente = threading.Thread(target=_pedir, args=(URGENTE, 5, "urgente"))
+    normal = threading.Thread(target=_pedir, args=(NORMAL, 1, "normal"))
+    urgente.start()
+    time.sleep(0.05)
+    normal.start()  # sozinho teria saldo em ~0,1 s; com o urgente esperando, vai depois
+    urgente.join(3); normal.join(3)
+    assert ordem == ["urgente", "normal"]
+
+
+def test_registrar_baixa_saldo_pelo_peso_usado():
+    o = OrcamentoPeso(limite_minuto=60, margem=1.0)
+    o.registrar(_Resposta(headers={"X-MBX-USED-WEIGHT-1M": "40"}))
+    assert o.saldo <= 20.5
+    # o header nunca aumenta o saldo local
+    o.registrar(_Resposta(headers={"X-MBX-USED-WEIGHT-1M": "0"}))
+    assert o.saldo <= 21
+
+
+def test_429_e_418_pausam_todas_as_prioridades():
+    for status in (429, 418):
+        o = OrcamentoPeso(limite_minuto=6000, margem=1.0)
+        o.registrar(_Resposta(status, {"Retry-After": "2"}))
+        for prioridade in (URGENTE, NORMAL, BAIXA):
+            assert not o.reservar(1, prioridade, timeout=0.2)
+        t0 = time.monotonic()
+        assert o.reservar(1, URGENTE, timeout=3)
+        assert 0.8 < time.monotonic() - t0 < 2.0
+
+
+def test_reservar_com_timeout_devolve_false():
+    o = OrcamentoPeso(limite_minuto=60, margem=1.0)
+    assert o.reservar(60, URGENTE)
+    t0 = time.monotonic()
+    assert o.reservar(30, URGENTE, timeout=0.2) is False
+    assert time.monotonic() - t0 < 0.5
@@ -0,0 +1,152 @@
+import math, random, time
+
+import pytest
+
+from pivos import DetectorPivos, DivergenciaIncremental, detectar_divergencia
+
+# fundo mais baixo no preço, fundo mais alto no indicador (e o espelho para topos)
+CLOSE_ALTA = [10, 9, 8, 7, 8, 9, 10, 9, 8, 6, 7, 8, 9, 9.5]
+IND_ALTA = [30, 28, 25, 20, 25, 28, 30, 29, 28, 24, 26, 28, 29, 29.5]
+
+
+def _pivos_forca_bruta(xs, k):
+    # janela cheia de 2k+1; em empates vale a ocorrência mais recente
+    out = []
+    for c in range(k, len(xs) - k):
+        w = xs[c - k:c + k + 1]
+        if xs[c] == max(w) and xs[c] not in w[k + 1:]:
+            out.append(("topo", c))
+        if xs[c] == min(w) and xs[c] not in w[k + 1:]:
+            out.append(("fundo", c))
+    return sorted(out)
+
+
+@pytest.mark.parametrize("janela", [1, 3, 5])
+def test_pivos_batem_com_varredura_forca_bruta(janela):
+    random.seed(janela)
+    xs = [random.randint(0, 20) for _ in range(2000)]  # inteiros: muitos empates/platôs
+    det = DetectorPivos(janela)
+    achados = sorted((t, i) for x in xs for t, i, _ in det.atualizar(x))
+    assert achados == _pivos_forca_bruta(xs, janela)
+
+
+def test_pivos_sem_janela_cheia_na_borda_esquerda():
+    det = DetectorPivos(3)
+    # o 1º valor é o máximo, mas não tem 3 barras à esquerda
+    assert all(det.atualizar(x) == [] for x in [9, 1, 2, 3, 2, 1])
+    assert det.atualizar(0) == []
+
+
+def test_plato_gera_um_unico_topo():
+    det = DetectorPivos(2)
+    xs = [1, 2, 5, 5, 5, 2, 1, 0, 0]
+    topos = [i for x in xs for t, i, _ in det.atualizar(x) if t == "topo"]
+    assert topos == [4]
+
+
+def test_divergencia_alta_e_baixa():
+    assert detectar_divergencia(CLOSE_ALTA, IND_ALTA) == (True, "alta")
+    close_baixa = [-x for x in CLOSE_ALTA]
+    ind_baixa = [-x for x in IND_ALTA]
+    assert detectar_divergencia(close_baixa, ind_baixa) == (True, "baixa")
+    # preço e indicador na mesma direção: sem divergência
+    assert detectar_divergencia(CLOSE_ALTA, CLOSE_ALTA) == (False, None)
+
+
+def test_divergencia_expira_por_idade():
+    div = DivergenciaIncremental(janela=3, max_idade=6)
+    for c, i in zip(CLOSE_ALTA, IND_ALTA):
+        div.atualizar(c, c, i)
+    assert div.estado() == (True, "alta")
+    for _ in range(10):
+        div.atualizar(9.5, 9.5, 29.5)
+    assert div.estado() == (False, None)
+
+
+def test_divergencia_ignora_pivos_muito_distantes():
+    close = CLOSE_ALTA[:7] + [10] * 80 + CLOSE_ALTA[7:]
+    ind = IND_ALTA[:7] + [30] * 80 + IND_ALTA[7:]
+    assert detectar_divergencia(close, ind, max_distancia=200) == (True, "alta")
+    assert detectar_divergencia(close, ind, max_distancia=60) == (False, None)
+
+
+def test_divergencia_pula_indicador_nan():
+    ind = list(IND_ALTA)
+    ind[3] = float("nan")  # 1º fundo sem indicador (aquecimento)
+    assert detectar_divergencia(CLOSE_ALTA, ind) == (False, None)
+
+
+def test_divergencia_rapida_em_milhares_de_candles():
+    random.seed(7)
+    close = [100.0]
+    for _ in range(19999):
+        close.append(close[-1] * (1 + random.gauss(0, 0.01)))
+    ind = [math.sin(i / 9.0) for i in range(len(close))]
+    t0 = time.perf_counter()
+    detectar_divergencia(close, ind)
+    assert time.perf_counter() - t0 < 1.0
+
+
+# ===== estado incremental do analisador (janelas sobrepostas de 100 candles)
+
+def _klines(n, h=3600000):
+    random.seed(11)
+    out, p = [], 100.0
+    for i in range(n):
+        o = p
+        p *= 1 + 0.01 * math.sin(i / 7) + random.gauss(0, 0.004)
+        out.append([i * h, o, max(o, p) * 1.003, min(o, p) * 0.997, p, 100 + 50 * random.random(), i * h + h - 1])
+    return out
+
+
+def test_divergencias_incrementais_nao_repetem_candle_e_obv_continua(tmp_path, monkeypatch):
+    analisador = pytest.importorskip("analisador")
+    from indicadores_tecnicos import calcular_obv, calcular_rsi, calcular_macd
+
+    alimentados = []
+
+    class _Gravador(DivergenciaIncremental):
+        def atualizar(self, alto, baixo, indicador):
+            alimentados.append((id(self), alto, indicador))
+            super().atualizar(alto, baixo, indicador)
+
+    monkeypatch.setattr(analisador, "DivergenciaIncremental", _Gravador)
+    monkeypatch.setattr(analisador, "BACKFILL_DIR", str(tmp_path))  # sem histórico local
+    analisador._DIVERG_STATE.clear()
+
+    todos = _klines(400)
+    for fim in range(100, 401, 3):
+        dados = todos[fim - 100:fim]
+        h = [k[2] for k in dados]; l = [k[3] for k in dados]
+        c = [k[4] for k in dados]; v = [k[5] for k in dados]
+        _, _, macd_hist = calcular_macd(c)
+        analisador._divergencias_incrementais("BTC", "btcusdt", "1h", dados, h, l, c, v,
+                                              calcular_rsi(c), calcular_obv(c, v), macd_hist)
+
+    st = analisador._DIVERG_STATE["BTC:1h"]
+    obv_feed = [(alto, ind) for dono, alto, ind in alimentados if dono == id(st["obv"])]
+    fechados = 399  # última janela = candles 300..399; o 399 está em formação
+    assert [alto for alto, _ in obv_feed] == [k[2] for k in todos[:fechados]]
+
+    # OBV da série inteira (começando no mesmo candle) = OBV reancorado janela a janela
+    obv_total = calcular_obv([k[4] for k in todos], [k[5] for k in todos])
+    assert [ind for _, ind in obv_feed] == pytest.approx(obv_total[:fechados])
+    analisador._DIVERG_STATE.clear()
+
+
+def test_semente_de_divergencia_exige_historico_sem_buraco(tmp_path, monkeypatch):
+    analisador = pytest.importorskip("analisador")
+    import backfill
+
+    h = 3600000
+    hist = _klines(300)
+    backfill._gravar_pagina(str(tmp_path), "btcusdt", "1h", hist)
+    monkeypatch.setattr(analisador, "BACKFILL_DIR", str(tmp_path))
+
+    emendado = [hist[-1][0] + h * (i + 1) for i in range(100)]
+    st = analisador._novo_estado_divergencia("btcusdt", "1h", emendado)
+    assert st["rsi"]._pivos.barras == 300 and st["close_ref"] is not None
+
+    dias_depois = [hist[-1][0] + h * (i + 72) for i in range(100)]
+    st = analisador._novo_estado_divergencia("btcusdt", "1h", dias_depois)
+    assert st["rsi"]._pivos.barras == 0 and st["close_ref"] is None
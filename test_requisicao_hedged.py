@@ -0,0 +1,75 @@
+import time
+
+import pytest
+import requests
+
+import requisicao_hedged as rh
+
+
+@pytest.fixture(autouse=True)
+def _limpar_stats():
+    rh._STATS.clear()
+    yield
+    rh._STATS.clear()
+
+
+def _get(base):
+    r = requests.get(f"{base}/api/v3/klines?symbol=BTCUSDT&interval=1h&limit=100", timeout=10)
+    return (r, None) if r.status_code == 200 else (None, f"HTTP {r.status_code}")
+
+
+def test_hedge_usa_host_rapido_quando_primario_demora(servidor_klines):
+    lento = servidor_klines(atraso=2.0)
+    rapido = servidor_klines()
+
+    t0 = time.monotonic()
+    resp, host, err = rh.buscar_hedged([lento, rapido], _get)
+    decorrido = time.monotonic() - t0
+
+    assert host == rapido and err is None
+    assert len(resp.json()) == 100
+    assert decorrido < rh.HEDGE_PADRAO_S + 0.5
+    # com a estatística do host rápido, ele passa a ser o 1º
+    assert rh.ordenar_hosts([lento, rapido])[0] == rapido
+
+
+def test_espera_em_preparar_nao_conta_como_latencia(servidor_klines):
+    rapido = servidor_klines()
+
+    def _preparar(base):
+        time.sleep(0.5)  # ex.: aguardando orçamento de peso
+
+    resp, host, _ = rh.buscar_hedged([rapido], _get, preparar=_preparar)
+    assert host == rapido
+    assert rh.estatisticas()[rapido]["p50"] < 0.3
+
+
+def test_falha_em_preparar_nao_penaliza_host(servidor_klines):
+    rapido = servidor_klines()
+    resp, host, err = rh.buscar_hedged([rapido], _get, preparar=lambda base: "sem orçamento")
+    assert resp is None and err == "sem orçamento"
+    assert rapido not in rh.estatisticas()
+
+
+def test_hedge_so_conta_tempo_depois_que_o_pedido_sai(servidor_klines):
+    a, b = servidor_klines(), servidor_klines()
+
+    def _preparar(base):
+        if base == a:
+            time.sleep(rh.HEDGE_PADRAO_S + 0.3)  # pedido preso antes de sair (fila/orçamento)
+
+    resp, host, _ = rh.buscar_hedged([a, b], _get, preparar=_preparar)
+    assert host == a
+    assert b not in rh.estatisticas()
+
+
+def test_fetch_candles_so_usa_hosts_configurados(servidor_klines, monkeypatch):
+    analisador = pytest.importorskip("analisador")
+    lento = servidor_klines(atraso=2.0)
+    rapido = servidor_klines()
+    monkeypatch.setenv("BINANCE_BASE_URLS", f"{lento},{rapido}")
+
+    assert analisador._bases_binance() == [lento, rapido]
+    dados = analisador._fetch_candles("BTC", "btcusdt", "1h")
+    assert len(dados) == 100
+    assert set(rh.estatisticas()) <= {lento, rapido}
@@ -0,0 +1,84 @@
+import math
+
+import pytest
+
+from suporte_resistencia import MapaSuporteResistencia
+
+
+def _toque_fundo(mapa, preco, volume=1.0):
+    # vale isolado: 3 barras acima, o fundo, 3 barras acima (janela_pivo=3)
+    for x in [preco * 1.05] * 3 + [preco] + [preco * 1.05] * 3:
+        mapa.atualizar(x, x, volume)
+
+
+def test_grupo_nunca_passa_da_tolerancia():
+    mapa = MapaSuporteResistencia(tolerancia_pct=0.5)
+    passo = math.log1p(0.002)
+    itens = [(i * passo, 1) for i in range(11)]  # cadeia de níveis a 0,2% um do outro
+    grupos = mapa._agrupar(itens)
+    # sem encadear: grupos de 3 (0 / 0,2 / 0,4%), não um grupo só de 2%
+    assert len(grupos) == 4
+    for (a, _), (b, _) in zip(grupos, grupos[1:]):
+        assert b - a > mapa._tol
+
+
+def test_cluster_abaixo_de_min_toques_e_descartado():
+    mapa = MapaSuporteResistencia(min_toques=2, max_nos_volume=0)
+    _toque_fundo(mapa, 100.0)
+    assert mapa.niveis == []
+    _toque_fundo(mapa, 100.05)
+    assert mapa.niveis == [pytest.approx(100.025, rel=1e-4)]
+
+
+def test_toques_dos_dois_lados_da_borda_de_faixa_somam():
+    mapa = MapaSuporteResistencia(tolerancia_pct=0.5, min_toques=2, max_nos_volume=0)
+    borda = math.exp(4000 * mapa._tol)  # fronteira exata entre duas faixas de tolerância
+    _toque_fundo(mapa, borda * 0.9995)
+    _toque_fundo(mapa, borda * 1.0005)
+    assert mapa.niveis == [pytest.approx(borda, rel=1e-4)]
+
+
+def test_nos_de_volume_caem_nas_faixas_mais_pesadas():
+    mapa = MapaSuporteResistencia(passo_pct=0.25, min_toques=10 ** 6, max_nos_volume=2)
+    for preco, vol in [(100.0, 50.0), (120.0, 30.0), (110.0, 1.0), (90.0, 1.0)]:
+        for _ in range(5):
+            mapa.atualizar(preco, preco, vol)
+    niveis = mapa.niveis
+    assert len(niveis) == 2
+    assert niveis[0] == pytest.approx(100.0, rel=0.0025)
+    assert niveis[1] == pytest.approx(120.0, rel=0.0025)
+
+
+def test_mais_proximos_sem_nivel_de_um_lado_e_preco_no_nivel():
+    mapa = MapaSuporteResistencia(min_toques=10 ** 6, max_nos_volume=1)
+    mapa.atualizar(100.0, 100.0, 10.0)
+    nivel = mapa.niveis[0]
+    assert mapa.mais_proximos(nivel * 0.9) == (None, nivel)
+    assert mapa.mais_proximos(nivel * 1.1) == (nivel, None)
+    # exatamente no nível: ele é suporte e resistência ao mesmo tempo
+    assert mapa.mais_proximos(nivel) == (nivel, nivel)
+
+
+def test_historico_so_de_volume_nao_alimenta_pivos():
+    mapa = MapaSuporteResistencia(min_toques=1, max_nos_volume=0)
+    for x in [105, 105, 105, 100, 105, 105, 105]:
+        mapa.atualizar(x, x, 1.0, pivos=False)
+    assert mapa.niveis == [] and mapa._pivos.barras == 0
+
+
+def test_semente_de_sr_so_usa_pivos_de_historico_sem_buraco(tmp_path, monkeypatch):
+    analisador = pytest.importorskip("analisador")
+    import backfill
+
+    h = 3600000
+    hist = [[i * h, 100.0, 101.0 + i % 5, 99.0 - i % 3, 100.0, 10.0, i * h + h - 1] for i in range(200)]
+    backfill._gravar_pagina(str(tmp_path), "btcusdt", "1h", hist)
+    monkeypatch.setattr(analisador, "BACKFILL_DIR", str(tmp_path))
+
+    emendado = [hist[-1][0] + h * (i + 1) for i in range(100)]
+    mapa = analisador._novo_estado_sr("btcusdt", "1h", emendado)["mapa"]
+    assert mapa._pivos.barras == 200
+
+    dias_depois = [hist[-1][0] + h * (i + 72) for i in range(100)]
+    mapa = analisador._novo_estado_sr("btcusdt", "1h", dias_depois)["mapa"]
+    assert mapa._pivos.barras == 0 and mapa._volume